@@ -4,9 +4,49 @@ import json
 import os
 import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import requests
+from urllib3.exceptions import NewConnectionError
 import re
+import io
+import math
+import queue
+import itertools
+import csv
+from collections import deque
+
+# Notion API limits for appending block children
+NOTION_MAX_BLOCKS_PER_REQUEST = 100
+NOTION_MAX_PAYLOAD_BYTES = 450000  # Notion rejects payloads above 500KB
+NOTION_MAX_BLOCK_BYTES = NOTION_MAX_PAYLOAD_BYTES - 1024  # room for the request wrapper
+NOTION_MAX_TEXT_LENGTH = 2000
+NOTION_MAX_RICH_TEXT_ITEMS = 100
+NOTION_MIN_REQUEST_INTERVAL = 0.34  # Notion allows about 3 requests per second
+NOTION_MAX_RETRIES = 4
+
+NOTION_CODE_LANGUAGES = {
+    "bash", "c", "c#", "c++", "css", "diff", "go", "html", "java", "javascript",
+    "json", "kotlin", "markdown", "php", "plain text", "python", "ruby", "rust",
+    "shell", "sql", "swift", "typescript", "xml", "yaml"
+}
+
+MARKDOWN_BLOCK_PATTERNS = [
+    (re.compile(r"^###\s+(.*)$"), "heading_3"),
+    (re.compile(r"^##\s+(.*)$"), "heading_2"),
+    (re.compile(r"^#\s+(.*)$"), "heading_1"),
+    (re.compile(r"^[-*+]\s+(.*)$"), "bulleted_list_item"),
+    (re.compile(r"^\d+[.)]\s+(.*)$"), "numbered_list_item"),
+    (re.compile(r"^>\s?(.*)$"), "quote")
+]
+MARKDOWN_TODO_PATTERN = re.compile(r"^[-*+]\s+\[([ xX])\]\s+(.*)$")
+MARKDOWN_DIVIDER_PATTERN = re.compile(r"^(-{3,}|\*{3,}|_{3,})$")
+
+# Database export
+EXPORT_FORMATS = ["csv", "jsonl", "parquet"]
+EXPORT_PARQUET_BATCH_ROWS = 10000
+EXPORT_FULL_REFRESH_DAYS = 7  # incremental runs can't see deleted pages
+LIST_PROPERTY_TYPES = {"multi_select", "people", "relation", "files"}
+TIMESTAMP_PROPERTY_TYPES = {"created_time", "last_edited_time"}
 
 class NotionAutomationApp:
     def __init__(self, root):
@@ -17,12 +57,25 @@ class NotionAutomationApp:
         # Configuration
         self.config_file = "notion_config.json"
         self.tasks_file = "automation_tasks.json"
+        self.export_state_file = "export_state.json"
         self.load_config()
         
         # Running tasks
         self.running_tasks = {}
         self.stop_flags = {}
         
+        # AI providers and their recent response latencies (seconds)
+        self.ai_providers = {
+            "gemini": self.query_gemini,
+            "openai": self.query_openai
+        }
+        self.provider_latencies = {name: deque(maxlen=100) for name in self.ai_providers}
+        self.latency_lock = threading.Lock()
+        
+        # Pacing for Notion requests shared by all task threads
+        self.last_notion_request = 0.0
+        self.notion_rate_lock = threading.Lock()
+        
         self.create_widgets()
         self.load_tasks()
         
@@ -33,12 +86,19 @@ class NotionAutomationApp:
             "default_database_id": "",
             "ai_provider": "gemini",  
             "gemini_api_key": "",
-            "ai_model": "gemini-1.5-flash"
+            "ai_model": "gemini-1.5-flash",
+            "openai_api_key": "",
+            "openai_base_url": "https://api.openai.com/v1",
+            "openai_model": "gpt-4o-mini",
+            "ai_hedging": True,
+            "ai_hedge_delay": 3.0,
+            "ai_timeout": 60
         }
         
         if os.path.exists(self.config_file):
             with open(self.config_file, 'r') as f:
-                self.config = json.load(f)
+                # Fill in settings added since the file was written
+                self.config = {**default_config, **json.load(f)}
         else:
             self.config = default_config
             self.save_config()
@@ -68,6 +128,11 @@ class NotionAutomationApp:
         notebook.add(manual_frame, text="Manual Control")
         self.create_manual_tab(manual_frame)
         
+        # Export Tab
+        export_frame = ttk.Frame(notebook)
+        notebook.add(export_frame, text="Export")
+        self.create_export_tab(export_frame)
+        
         # Logs Tab
         logs_frame = ttk.Frame(notebook)
         notebook.add(logs_frame, text="Logs")
@@ -105,6 +170,25 @@ class NotionAutomationApp:
                                foreground="blue", cursor="hand2")
         instructions.pack(anchor="w", pady=5)
         
+        ttk.Label(parent, text="OpenAI API Key:").pack(anchor="w", pady=5)
+        self.openai_key_entry = ttk.Entry(parent, width=60, show="*")
+        self.openai_key_entry.pack(fill="x", padx=5)
+        self.openai_key_entry.insert(0, self.config.get("openai_api_key", ""))
+        
+        ttk.Label(parent, text="OpenAI Base URL (any OpenAI-compatible endpoint):").pack(anchor="w", pady=5)
+        self.openai_url_entry = ttk.Entry(parent, width=60)
+        self.openai_url_entry.pack(fill="x", padx=5)
+        self.openai_url_entry.insert(0, self.config.get("openai_base_url", "https://api.openai.com/v1"))
+        
+        ttk.Label(parent, text="OpenAI Model:").pack(anchor="w", pady=5)
+        self.openai_model_entry = ttk.Entry(parent, width=60)
+        self.openai_model_entry.pack(fill="x", padx=5)
+        self.openai_model_entry.insert(0, self.config.get("openai_model", "gpt-4o-mini"))
+        
+        self.ai_hedging_var = tk.BooleanVar(value=self.config.get("ai_hedging", True))
+        ttk.Checkbutton(parent, text="Hedge slow AI requests to a second provider",
+                        variable=self.ai_hedging_var).pack(anchor="w", pady=5)
+        
         ttk.Button(parent, text="Save Configuration", command=self.save_configuration).pack(pady=10)
         ttk.Button(parent, text="Test Connection", command=self.test_connection).pack(pady=5)
     
@@ -168,6 +252,41 @@ class NotionAutomationApp:
         self.result_display = scrolledtext.ScrolledText(parent, height=10, state="disabled")
         self.result_display.pack(fill="both", expand=True, padx=5, pady=5)
     
+    def create_export_tab(self, parent):
+        """Create database export tab"""
+        ttk.Label(parent, text="Database ID (blank for default):").pack(anchor="w", pady=5)
+        self.export_db_entry = ttk.Entry(parent, width=60)
+        self.export_db_entry.pack(fill="x", padx=5)
+        
+        ttk.Label(parent, text="Output File:").pack(anchor="w", pady=5)
+        self.export_path_entry = ttk.Entry(parent, width=60)
+        self.export_path_entry.pack(fill="x", padx=5)
+        self.export_path_entry.insert(0, "notion_export.csv")
+        
+        ttk.Label(parent, text="Format:").pack(anchor="w", pady=5)
+        self.export_format = ttk.Combobox(parent, values=EXPORT_FORMATS, state="readonly")
+        self.export_format.pack(fill="x", padx=5)
+        self.export_format.set("csv")
+        self.export_format.bind("<<ComboboxSelected>>", self.update_export_extension)
+        
+        ttk.Label(parent, text="Properties (comma-separated, blank for all):").pack(anchor="w", pady=5)
+        self.export_properties_entry = ttk.Entry(parent, width=60)
+        self.export_properties_entry.pack(fill="x", padx=5)
+        
+        self.export_incremental_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(parent, text=f"Only rows edited since the last export "
+                                     f"(full export every {EXPORT_FULL_REFRESH_DAYS} days)",
+                        variable=self.export_incremental_var).pack(anchor="w", pady=5)
+        
+        ttk.Button(parent, text="Export Now", command=self.execute_export).pack(pady=10)
+    
+    def update_export_extension(self, event=None):
+        """Match the output file extension to the selected export format"""
+        base, extension = os.path.splitext(self.export_path_entry.get().strip())
+        if base and extension.lstrip(".").lower() in EXPORT_FORMATS:
+            self.export_path_entry.delete(0, tk.END)
+            self.export_path_entry.insert(0, f"{base}.{self.export_format.get()}")
+    
     def create_logs_tab(self, parent):
         """Create logs tab"""
         self.logs_display = scrolledtext.ScrolledText(parent, state="disabled")
@@ -195,6 +314,10 @@ class NotionAutomationApp:
         self.config["ai_provider"] = self.ai_provider.get()
         self.config["gemini_api_key"] = self.gemini_key_entry.get()
         self.config["ai_model"] = self.ai_model_entry.get()
+        self.config["openai_api_key"] = self.openai_key_entry.get()
+        self.config["openai_base_url"] = self.openai_url_entry.get()
+        self.config["openai_model"] = self.openai_model_entry.get()
+        self.config["ai_hedging"] = self.ai_hedging_var.get()
         
         self.save_config()
         messagebox.showinfo("Success", "Configuration saved successfully!")
@@ -217,34 +340,161 @@ class NotionAutomationApp:
         except Exception as e:
             notion_status = f"✗ Notion: {str(e)}"
         
-        # Test AI connection
-        try:
-            ai_response = self.query_ai("Create a test task")
-            if ai_response and self.parse_ai_response(ai_response):
-                ai_status = "✓ Gemini: Connected"
-            else:
-                ai_status = "✗ Gemini: Invalid response or parsing failed"
-        except Exception as e:
-            ai_status = f"✗ Gemini: {str(e)}"
+        # Test each configured AI provider
+        ai_statuses = []
+        for name in self.get_ai_provider_order() or [self.config["ai_provider"]]:
+            label = {"gemini": "Gemini", "openai": "OpenAI"}[name]
+            try:
+                ai_response = self.query_provider(name, "Create a test task")
+                if ai_response and self.parse_ai_response(ai_response):
+                    ai_statuses.append(f"✓ {label}: Connected")
+                else:
+                    ai_statuses.append(f"✗ {label}: Invalid response or parsing failed")
+            except Exception as e:
+                ai_statuses.append(f"✗ {label}: {str(e)}")
+        ai_status = "\n".join(ai_statuses)
         
         messagebox.showinfo("Connection Test", f"{notion_status}\n{ai_status}")
-        self.log_message(f"Connection test: {notion_status}, {ai_status}")
+        self.log_message(f"Connection test: {notion_status}, {', '.join(ai_statuses)}")
+    
+    def is_provider_configured(self, name):
+        """Check whether an AI provider has the settings it needs"""
+        if name == "gemini":
+            return bool(self.config.get("gemini_api_key"))
+        if name == "openai":
+            # Local OpenAI-compatible endpoints usually don't need a key
+            base_url = self.config.get("openai_base_url", "https://api.openai.com/v1")
+            return bool(self.config.get("openai_api_key")) or "api.openai.com" not in base_url
+        return False
+    
+    def record_provider_latency(self, name, seconds):
+        """Record how long a provider took to answer"""
+        with self.latency_lock:
+            self.provider_latencies[name].append(seconds)
+    
+    def get_provider_p95(self, name, min_samples=5):
+        """Return the p95 latency of a provider, or None without enough samples"""
+        with self.latency_lock:
+            samples = sorted(self.provider_latencies[name])
+        if len(samples) < min_samples:
+            return None
+        return samples[math.ceil(0.95 * len(samples)) - 1]
+    
+    def get_ai_provider_order(self):
+        """Order configured providers by preference, fastest p95 first"""
+        selected = self.config.get("ai_provider", "gemini")
+        providers = [name for name in self.ai_providers if self.is_provider_configured(name)]
+        
+        def sort_key(name):
+            p95 = self.get_provider_p95(name)
+            # Providers without latency history rank by the configured choice
+            return (p95 is None, p95 or 0, name != selected)
+        
+        return sorted(providers, key=sort_key)
+    
+    def get_hedge_delay(self, name):
+        """How long to wait on a provider before hedging to another one"""
+        p95 = self.get_provider_p95(name)
+        if p95 is None:
+            return float(self.config.get("ai_hedge_delay", 3.0))
+        return max(p95, 0.5)
+    
+    def query_provider(self, name, instruction):
+        """Query a single AI provider and track its latency
+        
+        Failures count as taking the full AI timeout, so a provider that
+        starts erroring or timing out drops down the provider order.
+        """
+        started = time.monotonic()
+        response = None
+        try:
+            response = self.ai_providers[name](instruction)
+        finally:
+            if response:
+                self.record_provider_latency(name, time.monotonic() - started)
+            else:
+                self.record_provider_latency(name, float(self.config.get("ai_timeout", 60)))
+        return response
     
     def query_ai(self, instruction):
         """Query AI with natural language instruction"""
-        if self.config["ai_provider"] == "gemini":
-            return self.query_gemini(instruction)
-        else:
-            return self.query_openai(instruction)
+        providers = self.get_ai_provider_order()
+        if not providers:
+            # Let the selected provider report what is missing
+            return self.query_provider(self.config.get("ai_provider", "gemini"), instruction)
+        
+        if len(providers) == 1 or not self.config.get("ai_hedging", True):
+            return self.query_provider(providers[0], instruction)
+        
+        return self.query_ai_hedged(instruction, providers[0], providers[1])
     
-    def query_gemini(self, instruction):
-        """Query Google Gemini AI"""
-        prompt = f"""
+    def query_ai_hedged(self, instruction, primary, secondary):
+        """Query the primary provider and hedge to the secondary if it is slow
+        
+        The first response that parses into an action wins. Requests can't be
+        aborted mid-flight, so the losing provider's answer is discarded.
+        """
+        results = queue.Queue()
+        cancelled = threading.Event()
+        
+        def worker(name):
+            try:
+                response = self.query_provider(name, instruction)
+            except Exception as e:
+                self.log_message(f"{name} query error: {str(e)}")
+                response = None
+            action_data = None
+            if response and not cancelled.is_set():
+                action_data = self.parse_ai_response(response)
+            results.put((name, response, action_data))
+        
+        def launch(name):
+            thread = threading.Thread(target=worker, args=(name,))
+            thread.daemon = True
+            thread.start()
+        
+        deadline = time.monotonic() + float(self.config.get("ai_timeout", 60))
+        launch(primary)
+        pending = 1
+        
+        try:
+            name, response, action_data = results.get(timeout=self.get_hedge_delay(primary))
+            pending -= 1
+            if action_data:
+                return response
+            self.log_message(f"{primary} gave no usable action, falling back to {secondary}")
+        except queue.Empty:
+            self.log_message(f"{primary} slower than hedge delay, also asking {secondary}")
+        
+        launch(secondary)
+        pending += 1
+        
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                name, response, action_data = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending -= 1
+            if action_data:
+                cancelled.set()
+                self.log_message(f"Hedged AI request answered by {name}")
+                return response
+        
+        cancelled.set()
+        self.log_message("No AI provider returned a usable action")
+        return None
+    
+    def build_ai_prompt(self, instruction):
+        """Build the prompt that translates an instruction into a Notion action"""
+        return f"""
         Convert this natural language instruction into specific Notion API actions:
         "{instruction}"
         
         You must respond with ONLY a valid JSON object (no markdown, no explanation, no extra text) containing:
-        - action: one of (create_page, update_page, query_database, create_database_entry)
+        - action: one of (create_page, update_page, query_database, create_database_entry, append_blocks, export_database)
         - parameters: relevant parameters for the action
         - explanation: brief explanation of what will be done
         
@@ -290,8 +540,46 @@ class NotionAutomationApp:
             "explanation": "Updates existing page properties"
         }}
         
+        For create_page, use this format (content is markdown and becomes the page body):
+        {{
+            "action": "create_page",
+            "parameters": {{
+                "parent_page_id": "PLACEHOLDER_PAGE_ID",
+                "title": "Meeting Notes",
+                "content": "# Agenda\\n- First item\\n- Second item"
+            }},
+            "explanation": "Creates a new page with the given content"
+        }}
+        
+        For append_blocks, use this format (content is markdown added to the end of the page):
+        {{
+            "action": "append_blocks",
+            "parameters": {{
+                "page_id": "PLACEHOLDER_PAGE_ID",
+                "content": "## Update\\nProgress notes for today"
+            }},
+            "explanation": "Appends content to an existing page"
+        }}
+        
+        For export_database, use this format (format is csv, jsonl or parquet; omit properties to export all):
+        {{
+            "action": "export_database",
+            "parameters": {{
+                "database_id": "default",
+                "output_path": "tasks_export.csv",
+                "format": "csv",
+                "properties": ["Name", "Status"],
+                "incremental": false
+            }},
+            "explanation": "Exports the database to a file"
+        }}
+        
         Remember: respond with ONLY the JSON object, nothing else.
         """
+    
+    def query_gemini(self, instruction):
+        """Query Google Gemini AI"""
+        prompt = self.build_ai_prompt(instruction)
         
         try:
             api_key = self.config.get("gemini_api_key", "")
@@ -325,7 +613,8 @@ class NotionAutomationApp:
                 "Content-Type": "application/json"
             }
             
-            response = requests.post(url, headers=headers, json=payload)
+            response = requests.post(url, headers=headers, json=payload,
+                                     timeout=self.config.get("ai_timeout", 60))
             
             if response.status_code == 200:
                 result = response.json()
@@ -343,6 +632,52 @@ class NotionAutomationApp:
             self.log_message(f"Gemini query error: {str(e)}")
             return None
     
+    def query_openai(self, instruction):
+        """Query OpenAI or any OpenAI-compatible chat completions endpoint"""
+        prompt = self.build_ai_prompt(instruction)
+        
+        try:
+            base_url = self.config.get("openai_base_url", "https://api.openai.com/v1").rstrip("/")
+            api_key = self.config.get("openai_api_key", "")
+            if not api_key and "api.openai.com" in base_url:
+                self.log_message("OpenAI API key not configured")
+                return None
+            
+            url = f"{base_url}/chat/completions"
+            
+            payload = {
+                "model": self.config.get("openai_model", "gpt-4o-mini"),
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.1,
+                "max_tokens": 2048
+            }
+            
+            headers = {
+                "Content-Type": "application/json"
+            }
+            if api_key:
+                headers["Authorization"] = f"Bearer {api_key}"
+            
+            response = requests.post(url, headers=headers, json=payload,
+                                     timeout=self.config.get("ai_timeout", 60))
+            
+            if response.status_code == 200:
+                result = response.json()
+                if 'choices' in result and len(result['choices']) > 0:
+                    content = result['choices'][0]['message']['content']
+                    return content.strip()
+                else:
+                    self.log_message("No response from OpenAI")
+                    return None
+            else:
+                self.log_message(f"OpenAI API error: {response.status_code} - {response.text}")
+                return None
+                
+        except Exception as e:
+            self.log_message(f"OpenAI query error: {str(e)}")
+            return None
     
     def parse_ai_response(self, ai_response):
         """Parse AI response and extract JSON"""
@@ -414,6 +749,60 @@ class NotionAutomationApp:
                 payload = {"properties": params.get("properties", {})}
                 response = requests.patch(url, headers=headers, json=payload)
             
+            elif action == "create_page":
+                if params.get("parent_page_id"):
+                    parent = {"page_id": params["parent_page_id"]}
+                    title_property = "title"
+                else:
+                    db_id = params.get("database_id", "default")
+                    if db_id == "default":
+                        db_id = self.config["default_database_id"]
+                    parent = {"database_id": db_id}
+                    title_property = "Name"
+                
+                properties = params.get("properties")
+                if not properties:
+                    properties = {title_property: {"title": self.text_to_rich_text(params.get("title", "Untitled"))}}
+                
+                # The first chunk goes in the create request, the rest is appended
+                chunks = self.chunk_blocks(self.content_to_blocks(params))
+                payload = {
+                    "parent": parent,
+                    "properties": properties,
+                    "children": next(chunks, [])
+                }
+                
+                response = self.send_notion_request("POST", "https://api.notion.com/v1/pages", headers, payload)
+                if response is None:
+                    return False
+                
+                if response.status_code == 200:
+                    page_id = response.json()["id"]
+                    # Chunk 0 went in with the create request
+                    success, sent = self.append_blocks(page_id, itertools.chain.from_iterable(chunks), headers,
+                                                       chunk_offset=1)
+                    if not success:
+                        self.log_message(f"Page {page_id} created with partial content")
+                        return False
+            
+            elif action == "export_database":
+                return self.export_database(
+                    params.get("output_path", "notion_export.csv"),
+                    params.get("format", "csv"),
+                    database_id=params.get("database_id"),
+                    properties=params.get("properties"),
+                    incremental=params.get("incremental", False)
+                )
+            
+            elif action == "append_blocks":
+                page_id = params.get("page_id") or params.get("block_id")
+                success, sent = self.append_blocks(page_id, self.content_to_blocks(params), headers,
+                                                   start_chunk=int(params.get("start_chunk", 0)))
+                if success:
+                    self.log_message(f"Successfully executed: {action_data.get('explanation', action)} "
+                                     f"({sent} chunks)")
+                return success
+            
             else:
                 self.log_message(f"Unknown action: {action}")
                 return False
@@ -429,6 +818,555 @@ class NotionAutomationApp:
             self.log_message(f"Error executing Notion action: {str(e)}")
             return False
     
+    def request_not_sent(self, error):
+        """Whether a failed request is known never to have reached Notion"""
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+    
+    def send_notion_request(self, method, url, headers, payload, idempotent=False):
+        """Send a paced Notion request, retrying failures that are safe to repeat
+        
+        Rate limits and connections that never reached Notion are always
+        retried. Server errors and timeouts are only retried for idempotent
+        requests, since a write may have been applied before it failed.
+        """
+        response = None
+        for attempt in range(NOTION_MAX_RETRIES + 1):
+            with self.notion_rate_lock:
+                wait = self.last_notion_request + NOTION_MIN_REQUEST_INTERVAL - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self.last_notion_request = time.monotonic()
+            
+            try:
+                response = requests.request(method, url, headers=headers, json=payload, timeout=60)
+                if response.status_code != 429 and (response.status_code < 500 or not idempotent):
+                    return response
+                error = f"{response.status_code} - {response.text}"
+            except requests.RequestException as e:
+                response = None
+                error = str(e)
+                if not idempotent and not self.request_not_sent(e):
+                    break
+            
+            if attempt == NOTION_MAX_RETRIES:
+                break
+            delay = 2 ** attempt
+            if response is not None and response.status_code == 429:
+                delay = float(response.headers.get("Retry-After", delay))
+            self.log_message(f"Notion request failed ({error}), retrying in {delay:.0f}s")
+            time.sleep(delay)
+        
+        if response is None:
+            self.log_message(f"Notion request failed: {error}")
+        return response
+    
+    def text_to_rich_text(self, text):
+        """Split text into rich text objects within Notion's length limit"""
+        return [
+            {"type": "text", "text": {"content": text[i:i + NOTION_MAX_TEXT_LENGTH]}}
+            for i in range(0, len(text), NOTION_MAX_TEXT_LENGTH)
+        ]
+    
+    def serialized_size(self, value):
+        """Size in bytes of a value as it is sent in a request body"""
+        return len(json.dumps(value).encode("utf-8"))
+    
+    def make_text_blocks(self, block_type, text, extra=None):
+        """Yield one or more blocks of a type holding the given text
+        
+        A new block is started before one would exceed the rich text item
+        limit or NOTION_MAX_BLOCK_BYTES once serialized.
+        """
+        def make_block(rich_text):
+            body = {"rich_text": rich_text}
+            body.update(extra or {})
+            return {"object": "block", "type": block_type, block_type: body}
+        
+        empty_size = self.serialized_size(make_block([]))
+        rich_text = []
+        size = empty_size
+        for item in self.text_to_rich_text(text):
+            item_size = self.serialized_size(item) + 2  # plus the ", " separator
+            if rich_text and (len(rich_text) >= NOTION_MAX_RICH_TEXT_ITEMS
+                              or size + item_size > NOTION_MAX_BLOCK_BYTES):
+                yield make_block(rich_text)
+                rich_text = []
+                size = empty_size
+            rich_text.append(item)
+            size += item_size
+        if rich_text or not text:
+            yield make_block(rich_text)
+    
+    def markdown_to_blocks(self, content):
+        """Convert markdown text or an iterable of lines into Notion blocks, one at a time"""
+        lines = io.StringIO(content) if isinstance(content, str) else content
+        # Buffered text is flushed by serialized size, the same measure as chunk_blocks
+        paragraph = []
+        paragraph_size = 0
+        code_language = None
+        code_lines = []
+        code_size = 0
+        
+        for raw_line in lines:
+            line = raw_line.rstrip("\r\n")
+            stripped = line.strip()
+            
+            # Inside a fenced code block everything is kept verbatim
+            if code_language is not None:
+                if stripped.startswith("```"):
+                    yield from self.make_text_blocks("code", "\n".join(code_lines), {"language": code_language})
+                    code_language = None
+                    code_lines = []
+                    code_size = 0
+                else:
+                    line_size = self.serialized_size(line)
+                    if code_lines and code_size + line_size > NOTION_MAX_BLOCK_BYTES:
+                        yield from self.make_text_blocks("code", "\n".join(code_lines), {"language": code_language})
+                        code_lines = []
+                        code_size = 0
+                    code_lines.append(line)
+                    code_size += line_size
+                continue
+            
+            # Plain lines accumulate into a paragraph until a blank line or other block
+            block = None
+            if stripped.startswith("```"):
+                language = stripped[3:].strip().lower() or "plain text"
+                code_language = language if language in NOTION_CODE_LANGUAGES else "plain text"
+            elif MARKDOWN_DIVIDER_PATTERN.match(stripped):
+                block = iter([{"object": "block", "type": "divider", "divider": {}}])
+            elif MARKDOWN_TODO_PATTERN.match(stripped):
+                checked, text = MARKDOWN_TODO_PATTERN.match(stripped).groups()
+                block = self.make_text_blocks("to_do", text, {"checked": checked != " "})
+            elif stripped:
+                for pattern, block_type in MARKDOWN_BLOCK_PATTERNS:
+                    match = pattern.match(stripped)
+                    if match:
+                        block = self.make_text_blocks(block_type, match.group(1))
+                        break
+            
+            line_size = self.serialized_size(line)
+            if paragraph and (block is not None or code_language is not None or not stripped
+                              or paragraph_size + line_size > NOTION_MAX_BLOCK_BYTES):
+                yield from self.make_text_blocks("paragraph", "\n".join(paragraph))
+                paragraph = []
+                paragraph_size = 0
+            
+            if block is not None:
+                yield from block
+            elif stripped and code_language is None:
+                paragraph.append(line)
+                paragraph_size += line_size
+        
+        if paragraph:
+            yield from self.make_text_blocks("paragraph", "\n".join(paragraph))
+        if code_lines:
+            yield from self.make_text_blocks("code", "\n".join(code_lines), {"language": code_language})
+    
+    def content_to_blocks(self, params):
+        """Get the blocks described by action parameters as a stream"""
+        if params.get("children"):
+            yield from params["children"]
+        elif params.get("content"):
+            yield from self.markdown_to_blocks(params["content"])
+    
+    def chunk_blocks(self, blocks):
+        """Group blocks into chunks that fit a single append request"""
+        empty_size = self.serialized_size({"children": []})
+        chunk = []
+        chunk_size = empty_size
+        for block in blocks:
+            block_size = self.serialized_size(block) + 2  # plus the ", " separator
+            if empty_size + block_size > NOTION_MAX_PAYLOAD_BYTES:
+                raise ValueError(f"A {block.get('type', 'block')} block is {block_size} bytes, "
+                                 f"over the {NOTION_MAX_PAYLOAD_BYTES} byte request limit")
+            if chunk and (len(chunk) >= NOTION_MAX_BLOCKS_PER_REQUEST
+                          or chunk_size + block_size > NOTION_MAX_PAYLOAD_BYTES):
+                yield chunk
+                chunk = []
+                chunk_size = empty_size
+            chunk.append(block)
+            chunk_size += block_size
+        if chunk:
+            yield chunk
+    
+    def append_blocks(self, block_id, blocks, headers, start_chunk=0, chunk_offset=0):
+        """Append blocks to a page in ordered chunks
+        
+        The next chunk is prepared in a background thread while the current
+        one is being sent, holding at most a couple of chunks in memory.
+        Chunks are numbered from chunk_offset, for content whose first
+        chunks were already sent elsewhere, and chunks numbered below
+        start_chunk are skipped so a failed append can be resumed.
+        Returns (success, chunks_sent).
+        """
+        url = f"https://api.notion.com/v1/blocks/{block_id}/children"
+        pending = queue.Queue(maxsize=2)
+        stop = threading.Event()
+        
+        def offer(item):
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                for chunk in self.chunk_blocks(blocks):
+                    if not offer(chunk):
+                        return
+            except Exception as e:
+                offer(e)
+                return
+            offer(None)
+        
+        producer = threading.Thread(target=produce)
+        producer.daemon = True
+        producer.start()
+        
+        index = chunk_offset
+        sent = 0
+        try:
+            while True:
+                chunk = pending.get()
+                if chunk is None:
+                    return True, sent
+                if isinstance(chunk, Exception):
+                    self.log_message(f"Failed to build blocks: {str(chunk)}")
+                    self.log_message(f"Append to {block_id} stopped; resume with start_chunk={index}")
+                    return False, sent
+                
+                if index >= start_chunk:
+                    response = self.send_notion_request("PATCH", url, headers, {"children": chunk})
+                    if response is None or response.status_code != 200:
+                        if response is not None:
+                            self.log_message(f"Notion API error: {response.status_code} - {response.text}")
+                        if response is None or response.status_code >= 500:
+                            self.log_message(f"Chunk {index} may already have been appended to {block_id}; "
+                                             f"check the page before resuming")
+                        self.log_message(f"Append to {block_id} stopped; resume with start_chunk={index}")
+                        return False, sent
+                    sent += 1
+                index += 1
+        finally:
+            stop.set()
+    
+    def load_export_state(self):
+        """Load the last exported edit time of each export"""
+        if os.path.exists(self.export_state_file):
+            with open(self.export_state_file, 'r') as f:
+                return json.load(f)
+        return {}
+    
+    def save_export_state(self, state):
+        """Save the last exported edit time of each export"""
+        with open(self.export_state_file, 'w') as f:
+            json.dump(state, f, indent=2)
+    
+    def get_database_columns(self, db_id, headers, properties=None):
+        """Look up exported properties as (name, id, type) from the database schema"""
+        response = self.send_notion_request("GET", f"https://api.notion.com/v1/databases/{db_id}", headers, None,
+                                            idempotent=True)
+        if response is None or response.status_code != 200:
+            if response is not None:
+                self.log_message(f"Notion API error: {response.status_code} - {response.text}")
+            return None
+        
+        schema = response.json().get("properties", {})
+        names = properties or list(schema)
+        missing = [name for name in names if name not in schema]
+        if missing:
+            self.log_message(f"Unknown database properties: {', '.join(missing)}")
+            return None
+        return [(name, schema[name]["id"], schema[name]["type"]) for name in names]
+    
+    def iter_database_pages(self, db_id, headers, property_ids=None, since=None):
+        """Yield every page of a database query, fetching one API page at a time"""
+        url = f"https://api.notion.com/v1/databases/{db_id}/query"
+        if property_ids:
+            # Only the projected properties are sent back; Notion's IDs come
+            # already URL-encoded
+            url += "?" + "&".join(f"filter_properties={pid}" for pid in property_ids)
+        
+        payload = {
+            "page_size": 100,
+            "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]
+        }
+        if since:
+            # Notion rounds edit times to the minute, so rows edited in that
+            # minute are exported again rather than missed
+            payload["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}}
+        
+        while True:
+            # Queries only read, so they are safe to retry
+            response = self.send_notion_request("POST", url, headers, payload, idempotent=True)
+            if response is None:
+                raise RuntimeError("Database query failed")
+            if response.status_code != 200:
+                raise RuntimeError(f"Notion API error: {response.status_code} - {response.text}")
+            
+            result = response.json()
+            yield from result.get("results", [])
+            if not result.get("has_more"):
+                return
+            payload["start_cursor"] = result["next_cursor"]
+    
+    def flatten_property(self, prop):
+        """Convert a Notion property value into a plain Python value"""
+        if not prop:
+            return None
+        prop_type = prop.get("type")
+        value = prop.get(prop_type)
+        
+        if prop_type in ("title", "rich_text"):
+            return "".join(item.get("plain_text", "") for item in value)
+        if prop_type in ("select", "status"):
+            return value["name"] if value else None
+        if prop_type == "multi_select":
+            return [option["name"] for option in value]
+        if prop_type == "date":
+            if not value:
+                return None
+            return f"{value['start']}/{value['end']}" if value.get("end") else value["start"]
+        if prop_type == "people":
+            return [person.get("name") or person["id"] for person in value]
+        if prop_type == "relation":
+            return [related["id"] for related in value]
+        if prop_type == "files":
+            return [item.get("name", "") for item in value]
+        if prop_type in ("created_by", "last_edited_by"):
+            return value.get("name") or value.get("id")
+        if prop_type == "unique_id":
+            return f"{value['prefix']}-{value['number']}" if value.get("prefix") else value.get("number")
+        if prop_type in ("formula", "rollup"):
+            inner_type = value.get("type")
+            inner = value.get(inner_type)
+            if inner_type == "date":
+                return self.flatten_property({"type": "date", "date": inner})
+            if inner_type == "array":
+                return [self.flatten_property(item) for item in inner]
+            return inner
+        if prop_type == "verification":
+            return value.get("state") if value else None
+        # number, checkbox, url, email, phone_number, created_time, last_edited_time
+        return value
+    
+    def flatten_page(self, page, columns):
+        """Flatten a database page into a row keyed by column name"""
+        row = {"page_id": page["id"], "last_edited_time": page.get("last_edited_time")}
+        properties = page.get("properties", {})
+        for name, _, _ in columns:
+            row[name] = self.flatten_property(properties.get(name))
+        return row
+    
+    def read_csv(self, path):
+        """Read back the rows of an exported CSV file"""
+        with open(path, 'r', newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    
+    def read_jsonl(self, path):
+        """Read back the rows of an exported JSON Lines file"""
+        with open(path, 'r', encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+    
+    def read_parquet(self, path):
+        """Read back the rows of an exported Parquet file in batches"""
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=EXPORT_PARQUET_BATCH_ROWS):
+            yield from batch.to_pylist()
+    
+    def write_csv(self, path, columns, rows):
+        """Write rows to a CSV file, joining multi-valued properties"""
+        count = 0
+        with open(path, 'w', newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["page_id", "last_edited_time"] + [c[0] for c in columns])
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({
+                    key: ", ".join(str(item) for item in value) if isinstance(value, list) else value
+                    for key, value in row.items()
+                })
+                count += 1
+        return count
+    
+    def write_jsonl(self, path, columns, rows):
+        """Write rows to a JSON Lines file"""
+        count = 0
+        with open(path, 'w', encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+    
+    def parse_notion_time(self, value):
+        """Parse a Notion ISO 8601 date or datetime into a UTC datetime"""
+        if not value or isinstance(value, datetime):
+            return value or None
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc)
+    
+    def write_parquet(self, path, columns, rows):
+        """Write rows to a Parquet file in bounded row groups"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        
+        timestamp = pa.timestamp("ms", tz="UTC")
+        column_types = {"page_id": "string", "last_edited_time": "last_edited_time"}
+        fields = [pa.field("page_id", pa.string()), pa.field("last_edited_time", timestamp)]
+        for name, _, prop_type in columns:
+            if prop_type == "number":
+                fields.append(pa.field(name, pa.float64()))
+            elif prop_type == "checkbox":
+                fields.append(pa.field(name, pa.bool_()))
+            elif prop_type in LIST_PROPERTY_TYPES:
+                fields.append(pa.field(name, pa.list_(pa.string())))
+            elif prop_type in TIMESTAMP_PROPERTY_TYPES:
+                fields.append(pa.field(name, timestamp))
+            elif prop_type == "date":
+                # Date-only values are stored as midnight UTC
+                fields.append(pa.field(name, pa.struct([("start", timestamp), ("end", timestamp)])))
+            else:
+                fields.append(pa.field(name, pa.string()))
+            column_types[name] = prop_type
+        schema = pa.schema(fields)
+        
+        def coerce(name, value):
+            # Values read back from a previous file for a merge are already typed
+            prop_type = column_types[name]
+            if value is None or prop_type in ("number", "checkbox") or prop_type in LIST_PROPERTY_TYPES:
+                return value
+            if prop_type in TIMESTAMP_PROPERTY_TYPES:
+                return self.parse_notion_time(value)
+            if prop_type == "date":
+                if isinstance(value, dict):
+                    return value
+                start, _, end = value.partition("/")
+                return {"start": self.parse_notion_time(start), "end": self.parse_notion_time(end)}
+            # Formulas and rollups can hold any type, so store them as text
+            if isinstance(value, (list, dict)):
+                return json.dumps(value, ensure_ascii=False)
+            return str(value)
+        
+        count = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in iter(lambda: list(itertools.islice(rows, EXPORT_PARQUET_BATCH_ROWS)), []):
+                batch = [{name: coerce(name, value) for name, value in row.items()} for row in batch]
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+        return count
+    
+    def export_database(self, output_path, fmt="csv", database_id=None, properties=None, incremental=False):
+        """Stream a database to a CSV, JSONL or Parquet file
+        
+        Rows are written as each API page arrives, so memory stays bounded
+        regardless of database size. With incremental, only rows edited
+        since the last export to the same file are fetched and merged into
+        that file by page_id; only the IDs of the changed rows are held in
+        memory. A full export is done instead when the file is missing or
+        was written in another format or with other columns.
+        
+        Deleted and archived pages are not returned by the query, so
+        incremental runs keep their old rows; a full export is forced once
+        the last one is more than EXPORT_FULL_REFRESH_DAYS old to drop them.
+        """
+        db_id = database_id or "default"
+        if db_id == "default":
+            db_id = self.config["default_database_id"]
+        
+        writers = {"csv": self.write_csv, "jsonl": self.write_jsonl, "parquet": self.write_parquet}
+        readers = {"csv": self.read_csv, "jsonl": self.read_jsonl, "parquet": self.read_parquet}
+        fmt = (fmt or "csv").lower()
+        if fmt not in writers:
+            self.log_message(f"Unknown export format: {fmt}")
+            return False
+        
+        headers = {
+            "Authorization": f"Bearer {self.config['notion_token']}",
+            "Content-Type": "application/json",
+            "Notion-Version": "2022-06-28"
+        }
+        
+        columns = self.get_database_columns(db_id, headers, properties)
+        if columns is None:
+            return False
+        
+        # Each output file has its own watermark, stored with the format and
+        # columns the file was written with so a merge only reuses a matching file
+        state_key = json.dumps([db_id, os.path.abspath(output_path)])
+        state = self.load_export_state()
+        previous = state.get(state_key)
+        column_list = [list(column) for column in columns]
+        since = None
+        if incremental and os.path.exists(output_path) and isinstance(previous, dict):
+            full_export_at = previous.get("full_export_at")
+            refresh_due = (not full_export_at or datetime.now() - datetime.fromisoformat(full_export_at)
+                           > timedelta(days=EXPORT_FULL_REFRESH_DAYS))
+            if previous.get("format") != fmt or previous.get("columns") != column_list:
+                self.log_message(f"{output_path} was exported with a different format or columns, "
+                                 f"doing a full export")
+            elif refresh_due:
+                self.log_message(f"Last full export to {output_path} is over {EXPORT_FULL_REFRESH_DAYS} days old, "
+                                 f"doing a full export to drop deleted pages")
+            else:
+                since = previous.get("since")
+        latest = [since]
+        changed = set()
+        
+        def rows():
+            property_ids = [prop_id for _, prop_id, _ in columns] if properties else None
+            for page in self.iter_database_pages(db_id, headers, property_ids, since):
+                edited = page.get("last_edited_time")
+                if edited and (latest[0] is None or edited > latest[0]):
+                    latest[0] = edited
+                if since:
+                    changed.add(page["id"])
+                yield self.flatten_page(page, columns)
+        
+        # Write to temporary files so a failed export never replaces a good one
+        temp_path = output_path + ".part"
+        delta_path = output_path + ".delta.part"
+        try:
+            if since:
+                count = writers[fmt](delta_path, columns, rows())
+                unchanged = (row for row in readers[fmt](output_path) if row["page_id"] not in changed)
+                total = writers[fmt](temp_path, columns, itertools.chain(unchanged, readers[fmt](delta_path)))
+                os.remove(delta_path)
+            else:
+                count = total = writers[fmt](temp_path, columns, rows())
+            os.replace(temp_path, output_path)
+        except Exception as e:
+            self.log_message(f"Export of {db_id} failed: {str(e)}")
+            for path in (temp_path, delta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return False
+        
+        state[state_key] = {
+            "since": latest[0],
+            "format": fmt,
+            "columns": column_list,
+            "full_export_at": previous["full_export_at"] if since else datetime.now().isoformat()
+        }
+        self.save_export_state(state)
+        
+        if since:
+            self.log_message(f"Exported {count} changed rows from {db_id}; {output_path} now has {total} rows")
+        else:
+            self.log_message(f"Exported {count} rows from {db_id} to {output_path}")
+        return True
+    
     def create_task(self):
         """Create a new automation task"""
         name = self.task_name_entry.get().strip()
@@ -685,6 +1623,37 @@ class NotionAutomationApp:
             error_text = f"Error: {str(e)}"
             self.root.after(0, self._update_manual_result, error_text)
     
+    def execute_export(self):
+        """Export the database from the export tab"""
+        output_path = self.export_path_entry.get().strip()
+        if not output_path:
+            messagebox.showwarning("Warning", "Please enter an output file")
+            return
+        
+        properties = [name.strip() for name in self.export_properties_entry.get().split(",") if name.strip()]
+        args = (
+            output_path,
+            self.export_format.get(),
+            self.export_db_entry.get().strip() or None,
+            properties or None,
+            self.export_incremental_var.get()
+        )
+        
+        self.log_message(f"Exporting to {output_path}...")
+        
+        # Export in a separate thread to avoid blocking UI
+        thread = threading.Thread(target=self._execute_export_thread, args=args)
+        thread.daemon = True
+        thread.start()
+    
+    def _execute_export_thread(self, output_path, fmt, database_id, properties, incremental):
+        """Run a database export in thread"""
+        success = self.export_database(output_path, fmt, database_id, properties, incremental)
+        if success:
+            self.root.after(0, messagebox.showinfo, "Export", f"Export to {output_path} finished")
+        else:
+            self.root.after(0, messagebox.showerror, "Export", "Export failed, see Logs for details")
+    
     def _update_manual_result(self, text):
         """Update manual result display"""
         self.result_display.config(state="normal")